@@ -8,22 +8,59 @@ import os
 import random
 import re
 import struct
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Deque, Dict, List, Optional, TextIO, Tuple
 
 import boto3
 import requests
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from requests.adapters import HTTPAdapter
 from tqdm import tqdm
+from urllib3.util.retry import Retry
 
 GDC_FILES_ENDPOINT = "https://api.gdc.cancer.gov/files"
 GDC_DATA_ENDPOINT = "https://api.gdc.cancer.gov/data"
 
+# Byte ranges fetched up front by the TIFF probe
+TIFF_HEAD_BYTES = 256 * 1024
+TIFF_TAIL_BYTES = 512 * 1024
+# Largest out-of-line tag value read by the probe
+TIFF_VALUE_READ_CAP = 256 * 1024
+
+# Slides at least this large are downloaded as parallel range GETs
+PARALLEL_DOWNLOAD_MIN_BYTES = 256 * 1024 * 1024
+
+# Slides at least this large are streamed straight into S3 when uploads are
+# enabled (unless --keep-local), rather than staged on local disk first
+STREAM_TO_S3_MIN_BYTES = 256 * 1024 * 1024
+
+# Concurrent multipart upload parts (see build_s3_transfer_config)
+S3_UPLOAD_CONCURRENCY = 16
+
+# Download progress bars are advanced at most once per this many bytes (and
+# redraw at most every PROGRESS_MIN_INTERVAL seconds), so parallel parts
+# don't contend on tqdm's lock for every chunk
+PROGRESS_UPDATE_BYTES = 64 * 1024 * 1024
+PROGRESS_MIN_INTERVAL = 0.5
+
 # TIFF tag IDs
 TAG_ImageWidth = 256
 TAG_ImageLength = 257
 TAG_ImageDescription = 270
 
+# First four header bytes (byte order mark + magic) -> (struct byte order, is BigTIFF)
+TIFF_SIGNATURES = {
+    b"II*\x00": ("<", False),
+    b"MM\x00*": (">", False),
+    b"II+\x00": ("<", True),
+    b"MM\x00+": (">", True),
+}
+
 # TIFF type sizes (bytes per component)
 TIFF_TYPE_SIZES = {
     1: 1,   # BYTE
@@ -35,6 +72,26 @@ TIFF_TYPE_SIZES = {
     17: 8,  # SLONG8 (BigTIFF)
 }
 
+# Precompiled structs for every (byte order, format) the TIFF probe unpacks:
+# header/IFD fields, classic and BigTIFF IFD entries
+_STRUCTS = {
+    (bo, fmt): struct.Struct(bo + fmt)
+    for bo in "<>"
+    for fmt in ("H", "I", "Q", "HHII", "HHQQ")
+}
+
+# Flat lookup tables indexed directly by the uint16 field type read from an
+# IFD entry: component size (0 = unsupported type), and for each byte order
+# the unpacker for the integer types valid as ImageWidth/ImageLength.
+_TIFF_TYPE_SIZE_TABLE = bytes(TIFF_TYPE_SIZES.get(typ, 0) for typ in range(1 << 16))
+_TIFF_SCALAR_UNPACK = {
+    bo: tuple(
+        _STRUCTS[bo, {3: "H", 4: "I", 16: "Q"}[typ]].unpack_from if typ in (3, 4, 16) else None
+        for typ in range(max(TIFF_TYPE_SIZES) + 1)
+    )
+    for bo in "<>"
+}
+
 
 @dataclass
 class S3UploadConfig:
@@ -42,6 +99,7 @@ class S3UploadConfig:
     path_prefix: str
     endpoint: Optional[str]
     region: Optional[str]
+    use_crt: bool = False
 
 
 def _normalize_s3_prefix(prefix: str) -> str:
@@ -57,12 +115,14 @@ def load_s3_upload_config_from_env() -> Optional[S3UploadConfig]:
     path_prefix = _normalize_s3_prefix(os.getenv("S3_PATH_PREFIX") or "")
     endpoint = (os.getenv("S3_ENDPOINT") or "").strip() or None
     region = (os.getenv("S3_REGION") or "").strip() or None
+    use_crt = (os.getenv("S3_USE_CRT") or "").strip().lower() in ("1", "true", "yes")
 
     return S3UploadConfig(
         bucket=bucket,
         path_prefix=path_prefix,
         endpoint=endpoint,
         region=region,
+        use_crt=use_crt,
     )
 
 
@@ -71,6 +131,33 @@ def build_s3_client(config: S3UploadConfig) -> Any:
         "s3",
         endpoint_url=config.endpoint,
         region_name=config.region,
+        # One pooled connection per concurrent multipart upload part
+        config=Config(max_pool_connections=S3_UPLOAD_CONCURRENCY),
+    )
+
+
+def build_s3_transfer_config(config: S3UploadConfig) -> TransferConfig:
+    # 64 MiB parts, up to 16 in flight. With S3_USE_CRT, boto3 hands
+    # upload_file to the awscrt native transfer client (boto3[crt]), which
+    # does its own I/O and rejects the threading/io_chunksize knobs.
+    # Otherwise the classic client is pinned explicitly (the 'auto' default
+    # would switch to CRT on hosts awscrt considers optimized, since
+    # boto3[crt] is always installed) and reads the file back in 8 MiB
+    # blocks rather than boto3's default 256 KiB.
+    if config.use_crt:
+        return TransferConfig(
+            multipart_threshold=64 * 1024 * 1024,
+            multipart_chunksize=64 * 1024 * 1024,
+            max_concurrency=S3_UPLOAD_CONCURRENCY,
+            preferred_transfer_client="crt",
+        )
+    return TransferConfig(
+        multipart_threshold=64 * 1024 * 1024,
+        multipart_chunksize=64 * 1024 * 1024,
+        max_concurrency=S3_UPLOAD_CONCURRENCY,
+        io_chunksize=8 * 1024 * 1024,
+        use_threads=True,
+        preferred_transfer_client="classic",
     )
 
 
@@ -79,91 +166,170 @@ def s3_object_key(config: S3UploadConfig, rel_path: Path) -> str:
     return f"{config.path_prefix}{rel}" if config.path_prefix else rel
 
 
+def s3_object_size(client: Any, config: S3UploadConfig, key: str) -> Optional[int]:
+    # Size of an existing object, or None if the key isn't in the bucket yet
+    try:
+        resp = client.head_object(Bucket=config.bucket, Key=key)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            return None
+        raise
+    return int(resp["ContentLength"])
+
+
 def upload_file_to_s3(client: Any, config: S3UploadConfig, local_file: Path, rel_path: Path) -> str:
     key = s3_object_key(config, rel_path)
     client.upload_file(
         Filename=str(local_file),
         Bucket=config.bucket,
         Key=key,
+        Config=build_s3_transfer_config(config),
     )
     return key
 
 
+_UNSAFE_FILENAME_RE = re.compile(r"[^A-Za-z0-9._-]+")
+_SLASH_TO_UNDERSCORE = str.maketrans("/", "_")
+
+
 def safe_filename(name: str) -> str:
-    name = name.replace("/", "_")
-    name = re.sub(r"[^A-Za-z0-9._-]+", "_", name)
-    return name
+    # Slashes are mapped one-for-one before collapsing other runs, so
+    # "a/$b" stays "a__b"
+    return _UNSAFE_FILENAME_RE.sub("_", name.translate(_SLASH_TO_UNDERSCORE))
+
+
+# Concurrent GDC listing pages fetched by gdc_query_slides
+GDC_QUERY_PAGES = 4
+
+
+def build_http_session(pool_maxsize: int = 64) -> requests.Session:
+    # One pooled session for every GDC request so probes and downloads reuse
+    # open keep-alive connections instead of paying a TLS handshake each time.
+    # pool_maxsize must cover every connection open at once (main() sizes it
+    # from the CLI), or urllib3 discards the extras instead of keeping them
+    # alive.
+    retry = Retry(total=3, backoff_factor=0.3, status_forcelist=(502, 503, 504))
+    adapter = HTTPAdapter(pool_connections=32, pool_maxsize=pool_maxsize, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+HTTP_SESSION = build_http_session()
 
 
 def http_range_get(url: str, start: int, end_inclusive: int, timeout: int = 60) -> bytes:
     # end_inclusive because Range uses inclusive end
     headers = {"Range": f"bytes={start}-{end_inclusive}"}
-    r = requests.get(url, headers=headers, timeout=timeout)
+    r = HTTP_SESSION.get(url, headers=headers, timeout=timeout, stream=False)
     # 206 Partial Content expected; some servers may return 200 with full content (bad but possible)
     if r.status_code not in (200, 206):
         raise RuntimeError(f"Range request failed: HTTP {r.status_code}")
     return r.content
 
 
+def http_suffix_range_get(url: str, nbytes: int, timeout: int = 60) -> Optional[Tuple[int, bytes]]:
+    """
+    Fetch the last nbytes of the remote file with a suffix range (bytes=-N).
+    Returns (absolute offset of the first byte, data), or None if the server
+    did not honour the range.
+    """
+    headers = {"Range": f"bytes=-{nbytes}"}
+    with HTTP_SESSION.get(url, headers=headers, timeout=timeout, stream=True) as r:
+        # Without a 206 + Content-Range we can't place the bytes; don't read
+        # the body, since a 200 here would be the entire slide.
+        m = re.match(r"bytes (\d+)-\d+/", r.headers.get("Content-Range", ""))
+        if r.status_code != 206 or not m:
+            return None
+        return int(m.group(1)), r.content
+
+
+class RemoteByteRanges:
+    """
+    Spans of a remote file that have already been fetched, keyed by absolute
+    offset. Reads covered by a cached span are served locally; anything else
+    costs one range GET of at least min_fetch bytes.
+    """
+
+    def __init__(self, url: str, timeout: int, min_fetch: int = 4096):
+        self.url = url
+        self.timeout = timeout
+        self.min_fetch = min_fetch
+        self.spans: List[Tuple[int, bytes]] = []
+
+    def add(self, start: int, data: bytes) -> None:
+        self.spans.append((start, data))
+
+    def cached(self, offset: int, nbytes: int) -> Optional[bytes]:
+        for start, data in self.spans:
+            if start <= offset and offset + nbytes <= start + len(data):
+                return data[offset - start:offset - start + nbytes]
+        return None
+
+    def read(self, offset: int, nbytes: int) -> bytes:
+        data = self.cached(offset, nbytes)
+        if data is not None:
+            return data
+        data = http_range_get(self.url, offset, offset + max(nbytes, self.min_fetch) - 1, timeout=self.timeout)
+        self.add(offset, data)
+        return data[:nbytes]
+
+    def prefetch(self, wanted: List[Tuple[int, int]], max_gap: int = 64 * 1024) -> None:
+        """
+        Fetch every (offset, nbytes) in wanted that isn't cached yet, merging
+        ranges less than max_gap apart so they cost a single range GET.
+        """
+        missing = sorted((off, off + n) for off, n in wanted if self.cached(off, n) is None)
+        merged: List[List[int]] = []
+        for start, end in missing:
+            if merged and start <= merged[-1][1] + max_gap:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        for start, end in merged:
+            self.add(start, http_range_get(self.url, start, end - 1, timeout=self.timeout))
+
+
 def parse_tiff_first_ifd_dimensions(url: str, timeout: int = 60) -> Tuple[Optional[int], Optional[int], Optional[str], bool]:
     """
     Return (width, height, image_description, used_range_ok)
     - Only reads small byte ranges from the remote file.
     - Supports classic TIFF and BigTIFF.
     """
-    # Read first 64 KiB — enough for header + first IFD in most cases.
-    head = http_range_get(url, 0, 65535, timeout=timeout)
+    ranges = RemoteByteRanges(url, timeout)
+
+    # Fetch the head and the tail of the file in parallel. The header is at
+    # the start, but SVS writers commonly put the first IFD after the tile
+    # data near EOF, so having the tail saves a round trip on the common path.
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        tail = pool.submit(http_suffix_range_get, url, TIFF_TAIL_BYTES, timeout)
+        ranges.add(0, http_range_get(url, 0, TIFF_HEAD_BYTES - 1, timeout=timeout))
+        try:
+            tail_span = tail.result()
+        except requests.RequestException:
+            tail_span = None
+    if tail_span:
+        ranges.add(*tail_span)
 
+    head = ranges.read(0, 16)
     if len(head) < 16:
         return None, None, None, False
 
-    endian = head[0:2]
-    if endian == b"II":
-        bo = "<"
-    elif endian == b"MM":
-        bo = ">"
-    else:
-        return None, None, None, False
-
-    # Classic TIFF: magic 42 at bytes 2-4; BigTIFF: magic 43 at bytes 2-4
-    magic = struct.unpack(bo + "H", head[2:4])[0]
-
-    is_bigtiff = (magic == 43)
-    if not (magic == 42 or magic == 43):
+    # Byte order and magic (42 classic, 43 BigTIFF) in one lookup
+    signature = TIFF_SIGNATURES.get(head[:4])
+    if signature is None:
         return None, None, None, False
+    bo, is_bigtiff = signature
 
     if not is_bigtiff:
         # offset to first IFD is uint32 at bytes 4-8
-        ifd_offset = struct.unpack(bo + "I", head[4:8])[0]
-        entry_count_off = ifd_offset
-        if entry_count_off + 2 > len(head):
-            # fetch a tiny range around ifd_offset
-            chunk = http_range_get(url, ifd_offset, ifd_offset + 4095, timeout=timeout)
-            head = head + b""  # keep original; we’ll index into chunk
-            base = ifd_offset
-            # entry count is at chunk[0:2]
-            n = struct.unpack(bo + "H", chunk[0:2])[0]
-            entries_bytes = 12 * n
-            need = 2 + entries_bytes
-            if need > len(chunk):
-                chunk = http_range_get(url, ifd_offset, ifd_offset + need + 16, timeout=timeout)
-            entries = chunk[2:2 + entries_bytes]
-            width, height, desc = _parse_classic_ifd_entries(url, bo, entries, ifd_offset, timeout)
-            return width, height, desc, True
-
-        n = struct.unpack(bo + "H", head[entry_count_off:entry_count_off + 2])[0]
-        entries_off = entry_count_off + 2
-        entries_bytes = 12 * n
-        if entries_off + entries_bytes > len(head):
-            # fetch just enough
-            chunk = http_range_get(url, ifd_offset, ifd_offset + 2 + entries_bytes + 16, timeout=timeout)
-            n = struct.unpack(bo + "H", chunk[0:2])[0]
-            entries = chunk[2:2 + 12 * n]
-            width, height, desc = _parse_classic_ifd_entries(url, bo, entries, ifd_offset, timeout)
-            return width, height, desc, True
-
-        entries = head[entries_off:entries_off + entries_bytes]
-        width, height, desc = _parse_classic_ifd_entries(url, bo, entries, 0, timeout)
+        ifd_offset = _STRUCTS[bo, "I"].unpack_from(head, 4)[0]
+
+        # IFD: uint16 entry count, then entries of 12 bytes
+        n = _STRUCTS[bo, "H"].unpack_from(ranges.read(ifd_offset, 2))[0]
+        entries = ranges.read(ifd_offset + 2, 12 * n)
+        width, height, desc = _parse_ifd_entries(ranges, bo, entries, "HHII", "I")
         return width, height, desc, True
 
     else:
@@ -171,68 +337,59 @@ def parse_tiff_first_ifd_dimensions(url: str, timeout: int = 60) -> Tuple[Option
         # bytes 4-6: offset size (should be 8)
         # bytes 6-8: always 0
         # bytes 8-16: uint64 first IFD offset
-        if len(head) < 16:
-            return None, None, None, False
-        offsize = struct.unpack(bo + "H", head[4:6])[0]
+        offsize = _STRUCTS[bo, "H"].unpack_from(head, 4)[0]
         if offsize != 8:
             return None, None, None, False
-        ifd_offset = struct.unpack(bo + "Q", head[8:16])[0]
+        ifd_offset = _STRUCTS[bo, "Q"].unpack_from(head, 8)[0]
 
         # BigTIFF IFD: uint64 entry count, then entries of 20 bytes
         # entry: tag(2), type(2), count(8), value_or_offset(8)
-        # Try to ensure we have it
-        if ifd_offset + 8 > len(head):
-            chunk = http_range_get(url, ifd_offset, ifd_offset + 8191, timeout=timeout)
-            n = struct.unpack(bo + "Q", chunk[0:8])[0]
-            entries_bytes = 20 * n
-            need = 8 + entries_bytes
-            if need > len(chunk):
-                chunk = http_range_get(url, ifd_offset, ifd_offset + need + 16, timeout=timeout)
-            entries = chunk[8:8 + entries_bytes]
-            width, height, desc = _parse_bigtiff_ifd_entries(url, bo, entries, ifd_offset, timeout)
-            return width, height, desc, True
-
-        n = struct.unpack(bo + "Q", head[ifd_offset:ifd_offset + 8])[0]
-        entries_off = ifd_offset + 8
-        entries_bytes = 20 * n
-        if entries_off + entries_bytes > len(head):
-            chunk = http_range_get(url, ifd_offset, ifd_offset + 8 + entries_bytes + 16, timeout=timeout)
-            n = struct.unpack(bo + "Q", chunk[0:8])[0]
-            entries = chunk[8:8 + 20 * n]
-            width, height, desc = _parse_bigtiff_ifd_entries(url, bo, entries, ifd_offset, timeout)
-            return width, height, desc, True
-
-        entries = head[entries_off:entries_off + entries_bytes]
-        width, height, desc = _parse_bigtiff_ifd_entries(url, bo, entries, 0, timeout)
+        n = _STRUCTS[bo, "Q"].unpack_from(ranges.read(ifd_offset, 8))[0]
+        entries = ranges.read(ifd_offset + 8, 20 * n)
+        width, height, desc = _parse_ifd_entries(ranges, bo, entries, "HHQQ", "Q")
         return width, height, desc, True
 
 
-def _read_value_bytes(url: str, offset: int, nbytes: int, timeout: int) -> bytes:
+def _read_value_bytes(ranges: RemoteByteRanges, offset: int, nbytes: int) -> bytes:
     # Avoid huge range fetches; cap per request
-    cap = min(nbytes, 256 * 1024)
-    return http_range_get(url, offset, offset + cap - 1, timeout=timeout)
+    return ranges.read(offset, min(nbytes, TIFF_VALUE_READ_CAP))
 
 
-def _parse_classic_ifd_entries(url: str, bo: str, entries: bytes, base_offset: int, timeout: int) -> Tuple[Optional[int], Optional[int], Optional[str]]:
+def _parse_ifd_entries(ranges: RemoteByteRanges, bo: str, entries: bytes, entry_fmt: str,
+                       inline_fmt: str) -> Tuple[Optional[int], Optional[int], Optional[str]]:
+    """
+    Shared by classic TIFF (12-byte entries, 4-byte inline values) and
+    BigTIFF (20-byte entries, 8-byte inline values).
+    """
     width = None
     height = None
     desc = None
+    inline = _STRUCTS[bo, inline_fmt]
 
-    for i in range(0, len(entries), 12):
-        tag, typ, count, value_or_offset = struct.unpack(bo + "HHII", entries[i:i+12])
+    # Unpack every entry in one C-level pass and keep the tags of interest.
+    wanted: List[Tuple[int, int, int, int]] = []
+    for tag, typ, count, value_or_offset in _STRUCTS[bo, entry_fmt].iter_unpack(entries):
         if tag not in (TAG_ImageWidth, TAG_ImageLength, TAG_ImageDescription):
             continue
 
-        tsize = TIFF_TYPE_SIZES.get(typ)
+        tsize = _TIFF_TYPE_SIZE_TABLE[typ]
         if not tsize:
             continue
-        total = tsize * count
-
-        # If value fits in 4 bytes, it's stored inline.
-        if total <= 4:
-            raw = struct.pack(bo + "I", value_or_offset)[:total]
+        wanted.append((tag, typ, tsize * count, value_or_offset))
+
+    # Fetch all out-of-line values up front so nearby ones share a range GET.
+    ranges.prefetch([
+        (value_or_offset, min(total, TIFF_VALUE_READ_CAP))
+        for _, _, total, value_or_offset in wanted
+        if total > inline.size
+    ])
+
+    for tag, typ, total, value_or_offset in wanted:
+        # If the value fits in the value field, it's stored inline.
+        if total <= inline.size:
+            raw = inline.pack(value_or_offset)[:total]
         else:
-            raw = _read_value_bytes(url, value_or_offset, total, timeout)
+            raw = _read_value_bytes(ranges, value_or_offset, total)
 
         if tag == TAG_ImageWidth:
             width = _decode_scalar(raw, bo, typ)
@@ -248,58 +405,30 @@ def _parse_classic_ifd_entries(url: str, bo: str, entries: bytes, base_offset: i
     return width, height, desc
 
 
-def _parse_bigtiff_ifd_entries(url: str, bo: str, entries: bytes, base_offset: int, timeout: int) -> Tuple[Optional[int], Optional[int], Optional[str]]:
-    width = None
-    height = None
-    desc = None
-
-    for i in range(0, len(entries), 20):
-        tag, typ = struct.unpack(bo + "HH", entries[i:i+4])
-        count = struct.unpack(bo + "Q", entries[i+4:i+12])[0]
-        value_or_offset = struct.unpack(bo + "Q", entries[i+12:i+20])[0]
-
-        if tag not in (TAG_ImageWidth, TAG_ImageLength, TAG_ImageDescription):
-            continue
-
-        tsize = TIFF_TYPE_SIZES.get(typ)
-        if not tsize:
-            continue
-        total = tsize * count
-
-        # BigTIFF inline threshold is 8 bytes
-        if total <= 8:
-            raw = struct.pack(bo + "Q", value_or_offset)[:total]
-        else:
-            raw = _read_value_bytes(url, int(value_or_offset), int(total), timeout)
-
-        if tag == TAG_ImageWidth:
-            width = _decode_scalar(raw, bo, typ)
-        elif tag == TAG_ImageLength:
-            height = _decode_scalar(raw, bo, typ)
-        elif tag == TAG_ImageDescription:
-            try:
-                desc = raw.split(b"\x00", 1)[0].decode("utf-8", errors="replace")
-            except Exception:
-                desc = None
-
-    return width, height, desc
+def _decode_scalar(raw: bytes, bo: str, typ: int) -> Optional[int]:
+    # typ is one of TIFF_TYPE_SIZES here; BYTE / ASCII / RATIONAL / SLONG8
+    # have no unpacker since they're not valid for width/height
+    unpack = _TIFF_SCALAR_UNPACK[bo][typ]
+    if unpack is None:
+        return None
+    try:
+        return unpack(raw)[0]
+    except struct.error:
+        return None
 
 
-def _decode_scalar(raw: bytes, bo: str, typ: int) -> Optional[int]:
+def probe_slide_dimensions(url: str, timeout: int = 60) -> Tuple[Optional[int], Optional[int], Optional[str], bool]:
+    """
+    Like parse_tiff_first_ifd_dimensions, but never raises so it can run on a
+    worker thread; a failed probe is reported as (None, None, None, False).
+    """
     try:
-        if typ == 3:  # SHORT
-            return struct.unpack(bo + "H", raw[:2])[0]
-        if typ == 4:  # LONG
-            return struct.unpack(bo + "I", raw[:4])[0]
-        if typ == 16:  # LONG8
-            return struct.unpack(bo + "Q", raw[:8])[0]
-        # BYTE / ASCII not valid for width/height
+        return parse_tiff_first_ifd_dimensions(url, timeout=timeout)
     except Exception:
-        return None
-    return None
+        return None, None, None, False
 
 
-def gdc_query_slides(n_pool: int, seed: int, timeout: int = 60) -> List[Dict[str, Any]]:
+def gdc_query_slides(n_pool: int, seed: int, timeout: int = 60, pages: int = GDC_QUERY_PAGES) -> List[Dict[str, Any]]:
     rng = random.Random(seed)
     fields = [
         "file_id","file_name","file_size","md5sum","data_type","data_format","access",
@@ -320,17 +449,115 @@ def gdc_query_slides(n_pool: int, seed: int, timeout: int = 60) -> List[Dict[str
         ],
     }
 
-    params = {"size": str(n_pool), "fields": ",".join(fields), "format": "JSON"}
-    resp = requests.post(GDC_FILES_ENDPOINT, params=params, headers={"Content-Type": "application/json"},
-                         json={"filters": filters}, timeout=timeout)
-    resp.raise_for_status()
-    hits = resp.json().get("data", {}).get("hits", [])
+    # Fetch the pool as `pages` concurrent pages so the response transfers
+    # and JSON decodes overlap. Pages are sorted by file_id so they don't
+    # overlap or skip records.
+    page_size = max(1, -(-n_pool // max(1, pages)))
+
+    def fetch_page(start: int) -> List[Dict[str, Any]]:
+        params = {
+            "from": str(start),
+            "size": str(min(page_size, n_pool - start)),
+            "sort": "file_id:asc",
+            "fields": ",".join(fields),
+            "format": "JSON",
+        }
+        resp = HTTP_SESSION.post(GDC_FILES_ENDPOINT, params=params, headers={"Content-Type": "application/json"},
+                                 json={"filters": filters}, timeout=timeout)
+        resp.raise_for_status()
+        return resp.json().get("data", {}).get("hits", [])
+
+    with ThreadPoolExecutor(max_workers=max(1, pages)) as pool:
+        hits = [hit for page in pool.map(fetch_page, range(0, n_pool, page_size)) for hit in page]
     rng.shuffle(hits)
     return hits
 
 
+def file_md5(path: Path, chunk_size: int = 8 * 1024 * 1024) -> str:
+    md5 = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+def _pwrite_all(fd: int, data: bytes, offset: int) -> None:
+    view = memoryview(data)
+    while view:
+        n = os.pwrite(fd, view, offset)
+        view = view[n:]
+        offset += n
+
+
+def _download_part(url: str, fd: int, start: int, end_inclusive: int, pbar: tqdm,
+                   chunk_size: int, timeout: int) -> None:
+    headers = {"Range": f"bytes={start}-{end_inclusive}"}
+    offset = reported = start
+    with HTTP_SESSION.get(url, headers=headers, stream=True, timeout=timeout) as r:
+        if r.status_code != 206:
+            raise RuntimeError(f"Range request failed: HTTP {r.status_code}")
+        for chunk in r.iter_content(chunk_size=chunk_size):
+            if not chunk:
+                continue
+            _pwrite_all(fd, chunk, offset)
+            offset += len(chunk)
+            if offset - reported >= PROGRESS_UPDATE_BYTES:
+                pbar.update(offset - reported)
+                reported = offset
+        pbar.update(offset - reported)
+    if offset != end_inclusive + 1:
+        raise RuntimeError(f"Short range read: got bytes {start}-{offset - 1}, expected {start}-{end_inclusive}")
+
+
+def parallel_range_download(url: str, dest_path: Path, size: int, expected_md5: Optional[str], parts: int,
+                            chunk_size: int = 8 * 1024 * 1024, timeout: int = 60) -> Tuple[int, Optional[str]]:
+    """
+    Download a large file as `parts` concurrent range GETs, each writing its
+    slice of a preallocated file with pwrite. Several TCP flows get around the
+    per-connection rate limit of the GDC CDN. The MD5 is verified by reading
+    the finished file back, before it is moved into place.
+    """
+    tmp_path = dest_path.with_suffix(dest_path.suffix + ".part")
+    part_size = -(-size // parts)
+
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        if hasattr(os, "posix_fallocate"):
+            os.posix_fallocate(fd, 0, size)
+        with tqdm(
+            total=size,
+            unit="B",
+            unit_scale=True,
+            unit_divisor=1024,
+            mininterval=PROGRESS_MIN_INTERVAL,
+            desc=dest_path.name,
+        ) as pbar, ThreadPoolExecutor(max_workers=parts) as pool:
+            futures = [
+                pool.submit(_download_part, url, fd, start, min(start + part_size, size) - 1, pbar, chunk_size, timeout)
+                for start in range(0, size, part_size)
+            ]
+            for fut in futures:
+                fut.result()
+    finally:
+        os.close(fd)
+
+    computed = file_md5(tmp_path) if expected_md5 else None
+    if expected_md5 and computed and computed.lower() != expected_md5.lower():
+        raise RuntimeError(f"MD5 mismatch for {dest_path.name}: expected {expected_md5}, got {computed}")
+
+    os.replace(tmp_path, dest_path)
+    return size, computed
+
+
+def _write_chunk(fd: int, md5: Optional[Any], chunk: bytes, offset: int) -> None:
+    _pwrite_all(fd, chunk, offset)
+    if md5:
+        md5.update(chunk)
+
+
 def stream_download(url: str, dest_path: Path, expected_size: Optional[int], expected_md5: Optional[str],
-                    chunk_size: int = 8 * 1024 * 1024, timeout: int = 60) -> Tuple[int, Optional[str]]:
+                    chunk_size: int = 8 * 1024 * 1024, timeout: int = 60,
+                    write_depth: int = 4, parts: int = 1) -> Tuple[int, Optional[str]]:
     dest_path.parent.mkdir(parents=True, exist_ok=True)
 
     if dest_path.exists() and expected_size is not None:
@@ -338,38 +565,150 @@ def stream_download(url: str, dest_path: Path, expected_size: Optional[int], exp
         if on_disk == expected_size and expected_size > 0:
             return on_disk, None
 
+    if parts > 1 and expected_size is not None and expected_size >= PARALLEL_DOWNLOAD_MIN_BYTES:
+        return parallel_range_download(url, dest_path, expected_size, expected_md5, parts,
+                                       chunk_size=chunk_size, timeout=timeout)
+
     md5 = hashlib.md5() if expected_md5 else None
 
-    with requests.get(url, stream=True, timeout=timeout) as r:
+    with HTTP_SESSION.get(url, stream=True, timeout=timeout) as r:
         r.raise_for_status()
         total = expected_size if expected_size is not None else int(r.headers.get("Content-Length", "0") or "0")
 
         tmp_path = dest_path.with_suffix(dest_path.suffix + ".part")
         bytes_written = 0
 
-        with open(tmp_path, "wb") as f, tqdm(
-            total=total if total > 0 else None,
+        # Chunks go straight to the fd with pwrite: one syscall per chunk and
+        # no Python-level buffering. Reserving the final size up front lets
+        # the filesystem allocate contiguous extents instead of growing the
+        # file 8 MiB at a time.
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            if total > 0 and hasattr(os, "posix_fallocate"):
+                os.posix_fallocate(fd, 0, total)
+
+            with tqdm(
+                total=total if total > 0 else None,
+                unit="B",
+                unit_scale=True,
+                unit_divisor=1024,
+                mininterval=PROGRESS_MIN_INTERVAL,
+                desc=dest_path.name,
+            ) as pbar:
+                # Disk writes and hashing run on a single writer thread (so
+                # the MD5 sees chunks in order) while this thread keeps
+                # draining the socket. Both release the GIL on large buffers,
+                # so they overlap with the network. At most write_depth chunks
+                # are held in memory.
+                with ThreadPoolExecutor(max_workers=1) as writer:
+                    pending: Deque[Future] = deque()
+                    reported = 0
+                    for chunk in r.iter_content(chunk_size=chunk_size):
+                        if not chunk:
+                            continue
+                        pending.append(writer.submit(_write_chunk, fd, md5, chunk, bytes_written))
+                        if len(pending) > write_depth:
+                            pending.popleft().result()
+                        bytes_written += len(chunk)
+                        if bytes_written - reported >= PROGRESS_UPDATE_BYTES:
+                            pbar.update(bytes_written - reported)
+                            reported = bytes_written
+                    pbar.update(bytes_written - reported)
+                    for fut in pending:
+                        fut.result()
+
+            # Drop any preallocated tail if the body came up short
+            os.ftruncate(fd, bytes_written)
+        finally:
+            os.close(fd)
+
+        if expected_size is not None and bytes_written != expected_size:
+            raise RuntimeError(f"Size mismatch for {dest_path.name}: expected {expected_size}, got {bytes_written}")
+
+        os.replace(tmp_path, dest_path)
+
+    computed = md5.hexdigest() if md5 else None
+    if expected_md5 and computed and computed.lower() != expected_md5.lower():
+        raise RuntimeError(f"MD5 mismatch for {dest_path.name}: expected {expected_md5}, got {computed}")
+
+    return bytes_written, computed
+
+
+def stream_download_to_s3(url: str, client: Any, config: S3UploadConfig, key: str,
+                          expected_size: Optional[int], expected_md5: Optional[str],
+                          part_size: int = 64 * 1024 * 1024, workers: int = 8,
+                          chunk_size: int = 8 * 1024 * 1024, timeout: int = 60) -> Tuple[int, Optional[str]]:
+    """
+    Download url straight into an S3 multipart upload without touching local
+    disk. Each part_size buffer is uploaded as a part on a worker thread while
+    the next one downloads; at most `workers` parts are buffered at once.
+    The upload is aborted, leaving no object behind, if the download fails
+    or the size/MD5 don't match.
+    """
+    md5 = hashlib.md5() if expected_md5 else None
+    upload_id = client.create_multipart_upload(Bucket=config.bucket, Key=key)["UploadId"]
+
+    def upload_part(part_number: int, body: bytearray) -> Dict[str, Any]:
+        resp = client.upload_part(Bucket=config.bucket, Key=key, PartNumber=part_number,
+                                  UploadId=upload_id, Body=body)
+        return {"ETag": resp["ETag"], "PartNumber": part_number}
+
+    try:
+        parts: List[Dict[str, Any]] = []
+        bytes_read = 0
+
+        with HTTP_SESSION.get(url, stream=True, timeout=timeout) as r, tqdm(
+            total=expected_size,
             unit="B",
             unit_scale=True,
             unit_divisor=1024,
-            desc=dest_path.name,
-        ) as pbar:
+            mininterval=PROGRESS_MIN_INTERVAL,
+            desc=key.rsplit("/", 1)[-1],
+        ) as pbar, ThreadPoolExecutor(max_workers=workers) as pool:
+            r.raise_for_status()
+            in_flight: Deque[Future] = deque()
+            buf = bytearray()
+            part_number = 0
+            reported = 0
+
             for chunk in r.iter_content(chunk_size=chunk_size):
                 if not chunk:
                     continue
-                f.write(chunk)
-                bytes_written += len(chunk)
+                buf += chunk
+                bytes_read += len(chunk)
                 if md5:
                     md5.update(chunk)
-                pbar.update(len(chunk))
+                if bytes_read - reported >= PROGRESS_UPDATE_BYTES:
+                    pbar.update(bytes_read - reported)
+                    reported = bytes_read
 
-        os.replace(tmp_path, dest_path)
+                if len(buf) >= part_size:
+                    part_number += 1
+                    in_flight.append(pool.submit(upload_part, part_number, buf))
+                    buf = bytearray()
+                    if len(in_flight) >= workers:
+                        parts.append(in_flight.popleft().result())
 
-    computed = md5.hexdigest() if md5 else None
-    if expected_md5 and computed and computed.lower() != expected_md5.lower():
-        raise RuntimeError(f"MD5 mismatch for {dest_path.name}: expected {expected_md5}, got {computed}")
+            pbar.update(bytes_read - reported)
 
-    return bytes_written, computed
+            if buf or part_number == 0:
+                part_number += 1
+                in_flight.append(pool.submit(upload_part, part_number, buf))
+            parts.extend(fut.result() for fut in in_flight)
+
+        if expected_size is not None and bytes_read != expected_size:
+            raise RuntimeError(f"Size mismatch for {key}: expected {expected_size}, got {bytes_read}")
+        computed = md5.hexdigest() if md5 else None
+        if expected_md5 and computed and computed.lower() != expected_md5.lower():
+            raise RuntimeError(f"MD5 mismatch for {key}: expected {expected_md5}, got {computed}")
+
+        client.complete_multipart_upload(Bucket=config.bucket, Key=key, UploadId=upload_id,
+                                         MultipartUpload={"Parts": parts})
+    except BaseException:
+        client.abort_multipart_upload(Bucket=config.bucket, Key=key, UploadId=upload_id)
+        raise
+
+    return bytes_read, computed
 
 
 def extract_low_hanging_labels(hit: Dict[str, Any]) -> Dict[str, Any]:
@@ -419,6 +758,12 @@ def extract_low_hanging_labels(hit: Dict[str, Any]) -> Dict[str, Any]:
     return out
 
 
+def append_jsonl(f: TextIO, line: str) -> None:
+    # Flushed per record so the log survives the process being killed
+    f.write(line + "\n")
+    f.flush()
+
+
 def main() -> int:
     ap = argparse.ArgumentParser()
     ap.add_argument("--outdir", default="./tcga_brca_fullres_slides", help="Output directory")
@@ -427,10 +772,25 @@ def main() -> int:
     ap.add_argument("--pool", type=int, default=500, help="How many candidates to probe before downloading")
     ap.add_argument("--min-width", type=int, default=50000, help="Min level-0 width to accept")
     ap.add_argument("--min-height", type=int, default=50000, help="Min level-0 height to accept")
+    ap.add_argument("--min-bytes-per-pixel", type=float, default=0.05,
+                    help="Reject files smaller than min-width*min-height*this without probing (0 disables)")
     ap.add_argument("--dx-only", action="store_true", help="Only consider filenames containing 'DX'")
     ap.add_argument("--timeout", type=int, default=60, help="HTTP timeout seconds")
+    ap.add_argument("--probe-workers", type=int, default=32, help="Concurrent TIFF header probes")
+    ap.add_argument("--download-parts", type=int, default=8, help="Concurrent range GETs per large slide (1 disables)")
+    ap.add_argument("--keep-local", action="store_true",
+                    help="Always download slides to --outdir, even large ones that could stream straight to S3")
+    ap.add_argument("--skip-md5", action="store_true",
+                    help="Don't verify slides against the GDC md5sum; only the byte count is checked")
     args = ap.parse_args()
 
+    # Each probe holds two connections at once (head + suffix range), and a
+    # large slide adds --download-parts range GETs while the probe window is
+    # still full; size the keep-alive pool so none of them get discarded.
+    global HTTP_SESSION
+    HTTP_SESSION = build_http_session(
+        pool_maxsize=2 * max(1, args.probe_workers) + max(1, args.download_parts) + GDC_QUERY_PAGES)
+
     outdir = Path(args.outdir)
     outdir.mkdir(parents=True, exist_ok=True)
 
@@ -439,96 +799,163 @@ def main() -> int:
     if s3_config:
         print(
             f"S3 upload enabled: bucket={s3_config.bucket}, "
-            f"prefix={s3_config.path_prefix or '/'}"
+            f"prefix={s3_config.path_prefix or '/'}, "
+            f"crt={s3_config.use_crt}"
         )
     else:
         print("S3 upload disabled: set S3_BUCKET to enable uploads.")
 
     hits = gdc_query_slides(n_pool=args.pool, seed=args.seed, timeout=args.timeout)
+    # json.dumps without indent runs entirely in the C encoder (json.dump and
+    # indent both fall back to the pure-Python one); the pool is large and
+    # only read by tools, so write it compact in a single call.
     with open(outdir / "candidate_hits.json", "w") as f:
-        json.dump(hits, f, indent=2)
+        f.write(json.dumps(hits, separators=(",", ":")))
 
+    # accepted/rejected records are appended as JSON lines as they are
+    # decided, so a killed run still leaves a usable log
     accepted: List[Dict[str, Any]] = []
-    rejected: List[Dict[str, Any]] = []
+    accepted_path = outdir / "accepted.jsonl"
+    rejected_path = outdir / "rejected.jsonl"
 
+    candidates: List[Tuple[Dict[str, Any], str, str]] = []
     for hit in hits:
-        if len(accepted) >= args.n:
-            break
-
         file_id = hit["file_id"]
         file_name = safe_filename(hit.get("file_name") or f"{file_id}.svs")
 
         if args.dx_only and "DX" not in file_name:
             continue
 
-        data_url = f"{GDC_DATA_ENDPOINT}/{file_id}"
-
-        # Probe TIFF header/IFD to get full-res dimensions without full download
-        try:
-            w, h, desc, ranged = parse_tiff_first_ifd_dimensions(data_url, timeout=args.timeout)
-        except Exception as e:
-            # If range probing fails, fallback to a simple heuristic by size
-            w, h, desc, ranged = None, None, None, False
-
-        meta = extract_low_hanging_labels(hit)
-        meta["tiff_probe"] = {"width": w, "height": h, "ranged": ranged}
-
-        # Accept only if probe succeeded and dimensions are large
-        if w is None or h is None:
-            # fallback: reject small files aggressively (optional heuristic)
-            fs = int(hit.get("file_size") or 0)
-            if fs < 600 * 1024 * 1024:  # 600MB
-                rejected.append(meta)
-                continue
-        else:
-            if w < args.min_width or h < args.min_height:
-                rejected.append(meta)
+        candidates.append((hit, file_name, f"{GDC_DATA_ENDPOINT}/{file_id}"))
+
+    # No slide of min_width x min_height compresses below this many bytes, so
+    # smaller files are rejected on their GDC file_size without probing.
+    min_probe_bytes = int(args.min_width * args.min_height * args.min_bytes_per_pixel)
+
+    def too_small_to_probe(hit: Dict[str, Any]) -> bool:
+        return hit.get("file_size") is not None and int(hit["file_size"]) < min_probe_bytes
+
+    # Probe TIFF header/IFD to get full-res dimensions without full download.
+    # Probes are pure network wait, so keep a window of them in flight ahead of
+    # the consumer and take results in candidate order; accept/reject decisions
+    # are the same as a serial scan. New probes are only submitted while more
+    # slides are still needed, so at most one window is probed past the last
+    # accepted slide.
+    probe_window = max(1, args.probe_workers)
+    remaining = iter(candidates)
+    pending: Deque[Tuple[Tuple[Dict[str, Any], str, str], Optional[Future]]] = deque()
+
+    with open(accepted_path, "w") as accepted_log, open(rejected_path, "w") as rejected_log, \
+            ThreadPoolExecutor(max_workers=probe_window) as probe_pool:
+
+        def top_up_probes() -> None:
+            while len(pending) < probe_window:
+                candidate = next(remaining, None)
+                if candidate is None:
+                    return
+                hit, _, data_url = candidate
+                probe = None if too_small_to_probe(hit) else probe_pool.submit(
+                    probe_slide_dimensions, data_url, args.timeout)
+                pending.append((candidate, probe))
+
+        while len(accepted) < args.n:
+            top_up_probes()
+            if not pending:
+                break
+            (hit, file_name, data_url), probe = pending.popleft()
+
+            meta = extract_low_hanging_labels(hit)
+            if probe is None:
+                # Rejected on file size alone; tiff_probe stays None
+                append_jsonl(rejected_log, json.dumps(meta))
                 continue
 
-        # Passed prefilter: download
-        dest = outdir / file_name
-        print(f"\nDownloading (accepted by probe): {file_name}  ({w}x{h} if known)")
-        stream_download(
-            url=data_url,
-            dest_path=dest,
-            expected_size=int(hit["file_size"]) if hit.get("file_size") else None,
-            expected_md5=hit.get("md5sum"),
-            timeout=args.timeout,
-        )
+            # If range probing fails, fall back to a simple heuristic by size
+            w, h, desc, ranged = probe.result()
+            meta["tiff_probe"] = {"width": w, "height": h, "ranged": ranged}
 
-        if s3_client and s3_config:
-            slide_key = upload_file_to_s3(
-                client=s3_client,
-                config=s3_config,
-                local_file=dest,
-                rel_path=dest.relative_to(outdir),
-            )
-            print(f"Uploaded slide to s3://{s3_config.bucket}/{slide_key}")
-
-        meta_path = outdir / f"{file_name}.json"
-        with open(meta_path, "w") as f:
-            json.dump(meta, f, indent=2)
-
-        if s3_client and s3_config:
-            meta_key = upload_file_to_s3(
-                client=s3_client,
-                config=s3_config,
-                local_file=meta_path,
-                rel_path=meta_path.relative_to(outdir),
-            )
-            print(f"Uploaded metadata to s3://{s3_config.bucket}/{meta_key}")
+            # Accept only if probe succeeded and dimensions are large
+            if w is None or h is None:
+                # fallback: reject small files aggressively (optional heuristic)
+                fs = int(hit.get("file_size") or 0)
+                if fs < 600 * 1024 * 1024:  # 600MB
+                    append_jsonl(rejected_log, json.dumps(meta))
+                    continue
+            else:
+                if w < args.min_width or h < args.min_height:
+                    append_jsonl(rejected_log, json.dumps(meta))
+                    continue
 
-        accepted.append(meta)
+            # Passed prefilter: download
+            dest = outdir / file_name
+            expected_size = int(hit["file_size"]) if hit.get("file_size") else None
+            expected_md5 = None if args.skip_md5 else hit.get("md5sum")
+            print(f"\nDownloading (accepted by probe): {file_name}  ({w}x{h} if known)")
+
+            if (s3_client and s3_config and not args.keep_local
+                    and expected_size is not None and expected_size >= STREAM_TO_S3_MIN_BYTES):
+                # Large slide with S3 enabled: pipe it straight into a
+                # multipart upload instead of staging it on local disk.
+                # These never touch local disk, so the resume check is against
+                # the bucket: an object of the expected size is already done.
+                slide_key = s3_object_key(s3_config, dest.relative_to(outdir))
+                if s3_object_size(s3_client, s3_config, slide_key) == expected_size:
+                    print(f"Already in S3, skipping: s3://{s3_config.bucket}/{slide_key}")
+                else:
+                    stream_download_to_s3(
+                        url=data_url,
+                        client=s3_client,
+                        config=s3_config,
+                        key=slide_key,
+                        expected_size=expected_size,
+                        expected_md5=expected_md5,
+                        timeout=args.timeout,
+                    )
+                    print(f"Uploaded slide to s3://{s3_config.bucket}/{slide_key}")
+            else:
+                stream_download(
+                    url=data_url,
+                    dest_path=dest,
+                    expected_size=expected_size,
+                    expected_md5=expected_md5,
+                    timeout=args.timeout,
+                    parts=args.download_parts,
+                )
+
+                if s3_client and s3_config:
+                    slide_key = upload_file_to_s3(
+                        client=s3_client,
+                        config=s3_config,
+                        local_file=dest,
+                        rel_path=dest.relative_to(outdir),
+                    )
+                    print(f"Uploaded slide to s3://{s3_config.bucket}/{slide_key}")
+
+            # Serialize once: the same line is the per-slide sidecar (read by
+            # the compiler as <slide>.json) and the accepted.jsonl record
+            meta_line = json.dumps(meta)
+            meta_path = outdir / f"{file_name}.json"
+            meta_path.write_text(meta_line)
+
+            if s3_client and s3_config:
+                meta_key = upload_file_to_s3(
+                    client=s3_client,
+                    config=s3_config,
+                    local_file=meta_path,
+                    rel_path=meta_path.relative_to(outdir),
+                )
+                print(f"Uploaded metadata to s3://{s3_config.bucket}/{meta_key}")
+
+            append_jsonl(accepted_log, meta_line)
+            accepted.append(meta)
+
+        # Enough slides accepted: drop windowed probes that have not started.
+        for _, probe in pending:
+            if probe is not None:
+                probe.cancel()
 
-    accepted_path = outdir / "accepted.json"
-    rejected_path = outdir / "rejected.json"
     candidate_path = outdir / "candidate_hits.json"
 
-    with open(accepted_path, "w") as f:
-        json.dump(accepted, f, indent=2)
-    with open(rejected_path, "w") as f:
-        json.dump(rejected, f, indent=2)
-
     if s3_client and s3_config:
         for summary_path in (accepted_path, rejected_path, candidate_path):
             summary_key = upload_file_to_s3(
@@ -5,8 +5,15 @@ Navigate with arrow keys, zoom with +/-
 """
 
 import argparse
+import collections
+import ctypes
+import queue
+import sys
+import threading
+import time
 import tkinter as tk
-from PIL import Image, ImageTk
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 
 try:
     import openslide
@@ -15,6 +22,61 @@ except ImportError:
     print("Also ensure libopenslide is installed on your system.")
     exit(1)
 
+# openslide-python's ctypes binding for openslide_read_region, which
+# fills a caller-provided buffer without building a PIL image
+try:
+    from openslide.lowlevel import _read_region as _openslide_read_region
+except ImportError:
+    _openslide_read_region = None
+
+# Byte positions of R, G, B within OpenSlide's native-endian ARGB pixels
+_RGB_BYTES = slice(2, None, -1) if sys.byteorder == 'little' else slice(1, 4)
+
+DEFAULT_TILE_SIZE = 256  # used when the slide doesn't report a tile size
+TILE_CACHE_TILES = 256  # decoded RGB tiles kept in the viewer's LRU cache
+OPENSLIDE_CACHE_BYTES = 256 * 1024 * 1024
+STATUS_INTERVAL = 0.25  # seconds between status label updates
+FRAME_POLL_MS = 5  # how often the Tk thread checks for decoded frames
+
+STATUS_TEMPLATE = ("Position: (%d, %d) | "
+                   "Zoom level: %d/%d | "
+                   "Effective: %.2fx%s | "
+                   "[Arrows: pan, +/-: zoom, Q/Esc: quit]")
+
+
+# Spreads the 8 bits of a byte over the even bits of a 16-bit value
+_MORTON_SPREAD = [
+    sum(((b >> i) & 1) << (2 * i) for i in range(8)) for b in range(256)
+]
+
+
+def morton_key(x, y):
+    """Interleave the bits of two 16-bit ints into a Z-order key."""
+    return (_MORTON_SPREAD[x & 0xFF] | _MORTON_SPREAD[x >> 8 & 0xFF] << 16
+            | (_MORTON_SPREAD[y & 0xFF] | _MORTON_SPREAD[y >> 8 & 0xFF] << 16) << 1)
+
+
+def morton_order(tx_range, ty_range):
+    """Return tile coordinates covering the ranges in Z-order."""
+    tx0 = tx_range.start
+    ty0 = ty_range.start
+    return sorted(
+        ((tx, ty) for ty in ty_range for tx in tx_range),
+        key=lambda t: morton_key(t[0] - tx0, t[1] - ty0))
+
+
+def new_photo(width, height):
+    """Create an empty PhotoImage with an explicit Tk size."""
+    # Passing width/height pins the Tk image size so later puts and
+    # copies are clipped to it instead of growing the image.
+    return tk.PhotoImage(width=width, height=height)
+
+
+def encode_ppm(arr):
+    """Encode an HxWx3 uint8 array as binary PPM (P6) for Tk's photo reader."""
+    height, width = arr.shape[:2]
+    return b'P6\n%d %d\n255\n' % (width, height) + arr.tobytes()
+
 
 class SlideViewer:
     def __init__(self, slide_path, x_offset=0, y_offset=0, zoom_level=0):
@@ -27,8 +89,12 @@ class SlideViewer:
         self.view_width = self.initial_size
         self.view_height = self.initial_size
         self.nudge_amount = 256  # pixels to move per arrow key press
-        self.display_scale = 1.0  # Additional scaling when at max native zoom
-        self.max_display_scale = 10.0  # Maximum display scale (10x)
+        self.display_scale = 1  # Integer Tk zoom factor when at max native zoom
+        self.max_display_scale = 8  # Maximum display scale (8x)
+        self._step_cache = None  # nudge step for the current zoom
+        self.redraw_delay_ms = 16  # coalesce input bursts into one redraw per frame
+        self._pending_redraw = None
+        self._last_render_key = None
 
         # Get slide dimensions
         self.slide_width, self.slide_height = self.slide.dimensions
@@ -37,20 +103,74 @@ class SlideViewer:
         print(f"Level dimensions: {self.slide.level_dimensions}")
         print(f"Level downsamples: {self.slide.level_downsamples}")
 
+        # Integer downsample per level, used only for the nudge step and for
+        # clamping the view. Anything passed to read_region, or converted to
+        # level coordinates, uses OpenSlide's own float downsample so it
+        # round-trips through OpenSlide's division exactly.
+        self.level_downsamples = [
+            max(1, round(ds)) for ds in self.slide.level_downsamples]
+
+        # Native tile size per level, so cached tiles line up with what
+        # OpenSlide decodes
+        self.tile_sizes = [
+            (int(self.slide.properties.get(
+                f'openslide.level[{level}].tile-width', DEFAULT_TILE_SIZE)),
+             int(self.slide.properties.get(
+                 f'openslide.level[{level}].tile-height', DEFAULT_TILE_SIZE)))
+            for level in range(self.slide.level_count)
+        ]
+        self._tile_cache = collections.OrderedDict()
+        self._tile_lock = threading.Lock()
+
+        # Background workers that warm the tile cache around the view
+        self._prefetch_pool = ThreadPoolExecutor(max_workers=2)
+        self._prefetch_futures = []
+        self._prefetch_gen = 0
+
+        # Frames are decoded on a single I/O thread; the generation counter
+        # lets the Tk thread discard frames superseded before they arrive.
+        # Finished frames come back through a queue that the Tk thread
+        # polls, since Tk must not be called from the worker.
+        self._io_pool = ThreadPoolExecutor(max_workers=1)
+        self._render_gen = 0
+        self._frames = queue.Queue()
+        self._frames_in_flight = 0
+        self._frame_poll = None
+
+        # OpenSlide >= 4.0 lets us grow its 32 MiB internal cache
+        if hasattr(openslide, 'OpenSlideCache'):
+            try:
+                self.slide.set_cache(
+                    openslide.OpenSlideCache(OPENSLIDE_CACHE_BYTES))
+            except openslide.OpenSlideVersionError:
+                pass
+
         # Create window
         self.root = tk.Tk()
         self.root.title(f"Slide Viewer - {slide_path}")
         self.root.geometry(f"{self.initial_size}x{self.initial_size}")
 
-        # Create canvas for image display
-        self.canvas = tk.Canvas(self.root)
+        # Create canvas for image display. No border or focus ring, so the
+        # canvas size reported to on_resize is exactly the visible image
+        # area and Tk has no frame chrome to repaint around it.
+        self.canvas = tk.Canvas(self.root, highlightthickness=0, borderwidth=0)
         self.canvas.pack(fill=tk.BOTH, expand=True)
 
+        # One PhotoImage and canvas item, reused across frames; new pixels
+        # are written in rather than allocating an image per redraw
+        self.photo = new_photo(self.view_width, self.view_height)
+        self._zoom_src = None  # scratch image for display_scale > 1
+        self._canvas_item = self.canvas.create_image(
+            0, 0, anchor=tk.NW, image=self.photo)
+
         # Status label
         self.status_var = tk.StringVar()
         self.status_label = tk.Label(
             self.root, textvariable=self.status_var, anchor='w')
         self.status_label.pack(fill=tk.X)
+        self._status_args = None
+        self._pending_status = None
+        self._last_status = 0.0
 
         # Bind keys
         self.root.bind('<Left>', lambda e: self.nudge(-1, 0))
@@ -95,11 +215,17 @@ class SlideViewer:
             self.view_height = event.height
             self.update_view()
 
+    def _nudge_step(self):
+        """Level 0 distance moved by one nudge at the current zoom."""
+        if self._step_cache is None:
+            # Scale nudge amount by current zoom level and display scale
+            downsample = self.level_downsamples[self.zoom_level]
+            self._step_cache = self.nudge_amount * downsample // self.display_scale
+        return self._step_cache
+
     def nudge(self, dx, dy):
         """Move the view by nudge_amount in the given direction."""
-        # Scale nudge amount by current zoom level and display scale
-        downsample = self.slide.level_downsamples[self.zoom_level]
-        scaled_nudge = int(self.nudge_amount * downsample / self.display_scale)
+        scaled_nudge = self._nudge_step()
 
         self.x_offset += dx * scaled_nudge
         self.y_offset += dy * scaled_nudge
@@ -116,87 +242,290 @@ class SlideViewer:
             if self.zoom_level > 0:
                 # Still have native zoom levels to use
                 self.zoom_level -= 1
-                self.display_scale = 1.0
+                self.display_scale = 1
             elif self.display_scale < self.max_display_scale:
-                # At max native zoom, increase display scale
-                self.display_scale = min(self.display_scale * 1.5, self.max_display_scale)
+                # At max native zoom, double the display scale. Keeping it
+                # an integer lets Tk do the upscale with PhotoImage zoom.
+                self.display_scale = min(self.display_scale * 2, self.max_display_scale)
             else:
                 return  # Already at max zoom
         else:  # Zooming out (delta > 0)
-            if self.display_scale > 1.0:
+            if self.display_scale > 1:
                 # First reduce display scale
-                self.display_scale = max(self.display_scale / 1.5, 1.0)
-                if self.display_scale < 1.01:  # Close enough to 1.0
-                    self.display_scale = 1.0
+                self.display_scale = max(self.display_scale // 2, 1)
             elif self.zoom_level < self.max_zoom:
                 # Then use native zoom levels
                 self.zoom_level += 1
             else:
                 return  # Already at min zoom
+        self._step_cache = None  # nudge step depends on level and scale
         self.update_view()
 
     def update_view(self):
-        """Read region from slide and update display."""
+        """Schedule a redraw, coalescing bursts of key/wheel/resize events."""
+        self._cancel_prefetch()
+        if self._pending_redraw is not None:
+            self.root.after_cancel(self._pending_redraw)
+        self._pending_redraw = self.root.after(
+            self.redraw_delay_ms, self._do_update)
+
+    def _ensure_photo(self):
+        """Recreate the display PhotoImage if the view size has changed."""
+        if (self.photo.width() != self.view_width
+                or self.photo.height() != self.view_height):
+            self.photo = new_photo(self.view_width, self.view_height)
+            self.canvas.itemconfigure(self._canvas_item, image=self.photo)
+
+    def _get_tile(self, level, tx, ty):
+        """Return tile (tx, ty) of a level as an RGB array, via the LRU cache."""
+        key = (level, tx, ty)
+        with self._tile_lock:
+            tile = self._tile_cache.get(key)
+            if tile is not None:
+                self._tile_cache.move_to_end(key)
+                return tile
+        tw, th = self.tile_sizes[level]
+        downsample = self.slide.level_downsamples[level]
+        if _openslide_read_region is not None:
+            # Decode straight into the array that becomes the cache entry.
+            # Pixels are premultiplied ARGB, so outside the slide they're
+            # already black and the RGB bytes can be used as-is.
+            buf = np.empty((th, tw), dtype=np.uint32)
+            _openslide_read_region(
+                self.slide._osr,
+                buf.ctypes.data_as(ctypes.POINTER(ctypes.c_uint32)),
+                int(tx * tw * downsample), int(ty * th * downsample),
+                level, tw, th)
+            tile = buf.view(np.uint8).reshape(th, tw, 4)[:, :, _RGB_BYTES]
+        else:
+            region = self.slide.read_region(
+                (int(tx * tw * downsample), int(ty * th * downsample)),
+                level,
+                (tw, th)
+            )
+            # OpenSlide returns premultiplied RGBA, so pixels outside the
+            # slide are already black; dropping alpha by slicing avoids a
+            # PIL convert
+            tile = np.asarray(region)[:, :, :3]
+        with self._tile_lock:
+            self._tile_cache[key] = tile
+            if len(self._tile_cache) > TILE_CACHE_TILES:
+                self._tile_cache.popitem(last=False)
+        return tile
+
+    def _tile_range(self, x, y, level, width, height):
+        """Return (tx, ty) for every tile covering a region at level.
+
+        Tiles come back in Z-order so neighbouring tiles are visited
+        together, which keeps a small cache from thrashing on wide views.
+        Tiles lying wholly outside the level are skipped.
+        """
+        tw, th = self.tile_sizes[level]
+        downsample = self.slide.level_downsamples[level]
+        lx = int(x / downsample)
+        ly = int(y / downsample)
+        level_width, level_height = self.slide.level_dimensions[level]
+        width = min(width, level_width - lx)
+        height = min(height, level_height - ly)
+        if width <= 0 or height <= 0:
+            return []
+        return morton_order(range(lx // tw, (lx + width - 1) // tw + 1),
+                            range(ly // th, (ly + height - 1) // th + 1))
+
+    def _read_view(self, x, y, level, width, height):
+        """Assemble a (height, width, 3) RGB array at level from cached tiles.
+
+        x and y are level 0 coordinates, as for read_region.
+        """
+        tw, th = self.tile_sizes[level]
+        downsample = self.slide.level_downsamples[level]
+        lx = int(x / downsample)
+        ly = int(y / downsample)
+        level_width, level_height = self.slide.level_dimensions[level]
+        if lx + width > level_width or ly + height > level_height:
+            # Part of the view is past the slide edge; nothing is read for
+            # it, so start from black, which is what OpenSlide returns there
+            out = np.zeros((height, width, 3), dtype=np.uint8)
+        else:
+            out = np.empty((height, width, 3), dtype=np.uint8)
+        for tx, ty in self._tile_range(x, y, level, width, height):
+            # Overlap of this tile with the view, in level coordinates
+            x0 = max(lx, tx * tw)
+            x1 = min(lx + width, (tx + 1) * tw)
+            y0 = max(ly, ty * th)
+            y1 = min(ly + height, (ty + 1) * th)
+            tile = self._get_tile(level, tx, ty)
+            out[y0 - ly:y1 - ly, x0 - lx:x1 - lx] = \
+                tile[y0 - ty * th:y1 - ty * th, x0 - tx * tw:x1 - tx * tw]
+        return out
+
+    def _render(self, x, y, level, width, height):
+        """Assemble a region and encode it as PPM (runs on the I/O thread)."""
+        return encode_ppm(self._read_view(x, y, level, width, height))
+
+    def _cancel_prefetch(self):
+        """Drop prefetches for a view the user has already moved away from."""
+        self._prefetch_gen += 1
+        for future in self._prefetch_futures:
+            future.cancel()
+        self._prefetch_futures = []
+
+    def _prefetch_neighbors(self, x, y, level, width, height):
+        """Warm the tile cache for the views one nudge away in each direction."""
+        step = self._nudge_step()
+        gen = self._prefetch_gen
+        for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1)):
+            self._prefetch_futures.append(self._prefetch_pool.submit(
+                self._warm, gen, x + dx * step, y + dy * step,
+                level, width, height))
+
+    def _warm(self, gen, x, y, level, width, height):
+        """Decode any uncached tiles of a region (runs on a worker thread)."""
+        downsample = self.level_downsamples[level]
+        x = max(0, min(x, self.slide_width - width * downsample))
+        y = max(0, min(y, self.slide_height - height * downsample))
+        for tx, ty in self._tile_range(x, y, level, width, height):
+            if gen != self._prefetch_gen:
+                return  # the view moved on; stop decoding for a stale one
+            self._get_tile(level, tx, ty)
+
+    def _do_update(self):
+        """Work out the frame for the current view and start decoding it."""
+        self._pending_redraw = None
         try:
             # Get downsample factor for current level
-            downsample = self.slide.level_downsamples[self.zoom_level]
+            level = self.zoom_level
+            downsample = self.level_downsamples[level]
 
-            # When display_scale > 1, we read a smaller region and scale it up
-            read_width = int(self.view_width / self.display_scale)
-            read_height = int(self.view_height / self.display_scale)
+            # When display_scale > 1, we read a smaller region and let Tk
+            # scale it up (rounding up so the zoomed image covers the canvas)
+            k = self.display_scale
+            read_width = -(-self.view_width // k)
+            read_height = -(-self.view_height // k)
 
             # Calculate the region size at level 0 coordinates
-            region_width_l0 = int(read_width * downsample)
-            region_height_l0 = int(read_height * downsample)
+            region_width_l0 = read_width * downsample
+            region_height_l0 = read_height * downsample
 
             # Clamp offsets to ensure we don't read outside the image
             x = max(0, min(self.x_offset, self.slide_width - region_width_l0))
             y = max(0, min(self.y_offset, self.slide_height - region_height_l0))
 
-            # Read region from slide
-            # read_region takes (location, level, size)
-            # location is in level 0 coordinates
-            # size is in the requested level's coordinates
-            region = self.slide.read_region(
-                (x, y),
-                self.zoom_level,
-                (read_width, read_height)
-            )
+            # Nothing to do if this is exactly the frame already on screen
+            # (or on its way there), e.g. pressing an arrow key while
+            # clamped at the slide edge
+            render_key = (level, x, y, self.view_width, self.view_height, k)
+            if render_key == self._last_render_key:
+                self._prefetch_neighbors(x, y, level, read_width, read_height)
+                return
+            self._last_render_key = render_key
+
+            # Assemble the region from cached tiles on the I/O thread so a
+            # cold read doesn't block the Tk event loop; location is in
+            # level 0 coordinates, size in the requested level's coordinates
+            self._render_gen += 1
+            gen = self._render_gen
+            future = self._io_pool.submit(
+                self._render, x, y, level, read_width, read_height)
+            future.add_done_callback(
+                lambda f: self._frames.put((gen, f, render_key)))
+            self._frames_in_flight += 1
+            if self._frame_poll is None:
+                self._frame_poll = self.root.after(
+                    FRAME_POLL_MS, self._poll_frames)
 
-            # Convert RGBA to RGB (openslide returns RGBA)
-            region = region.convert('RGB')
-
-            # Scale up if display_scale > 1
-            if self.display_scale > 1.0:
-                region = region.resize(
-                    (self.view_width, self.view_height),
-                    Image.NEAREST  # Use nearest neighbor for sharp pixels
-                )
-
-            # Convert to PhotoImage for tkinter
-            self.photo = ImageTk.PhotoImage(region)
-
-            # Update canvas
-            self.canvas.delete('all')
-            self.canvas.create_image(0, 0, anchor=tk.NW, image=self.photo)
-
-            # Update status
-            effective_zoom = downsample / self.display_scale
-            scale_info = f" | Display scale: {self.display_scale:.1f}x" if self.display_scale > 1.0 else ""
-            self.status_var.set(
-                f"Position: ({x}, {y}) | "
-                f"Zoom level: {self.zoom_level}/{self.max_zoom} | "
-                f"Effective: {effective_zoom:.2f}x{scale_info} | "
-                f"[Arrows: pan, +/-: zoom, Q/Esc: quit]"
-            )
+        except Exception as e:
+            self._show_error(e)
+
+    def _poll_frames(self):
+        """Present frames handed back by the I/O thread (runs on the Tk thread)."""
+        self._frame_poll = None
+        while True:
+            try:
+                gen, future, render_key = self._frames.get_nowait()
+            except queue.Empty:
+                break
+            self._frames_in_flight -= 1
+            self._present(gen, future, render_key)
+        # Keep polling only while frames are still being decoded
+        if self._frames_in_flight:
+            self._frame_poll = self.root.after(FRAME_POLL_MS, self._poll_frames)
+
+    def _present(self, gen, future, render_key):
+        """Show a decoded frame in the display (runs on the Tk thread)."""
+        if gen != self._render_gen:
+            return  # a newer frame has been requested since this one
+        level, x, y, view_width, view_height, k = render_key
+        read_width = -(-view_width // k)
+        read_height = -(-view_height // k)
+        try:
+            ppm = future.result()
+
+            # Load into the reused PhotoImage shown on the canvas. The PPM
+            # bytes were built on the I/O thread, so all that's left here
+            # is Tk's own decode straight into the photo.
+            self._ensure_photo()
+            if k > 1:
+                # Tk's photo copy -zoom does a nearest-neighbour expansion
+                # in C without a Python-side buffer
+                if (self._zoom_src is None
+                        or self._zoom_src.width() != read_width
+                        or self._zoom_src.height() != read_height):
+                    self._zoom_src = new_photo(read_width, read_height)
+                self._zoom_src.configure(data=ppm, format='PPM')
+                self.root.tk.call(
+                    str(self.photo), 'copy', str(self._zoom_src), '-zoom', k, k)
+            else:
+                self.photo.configure(data=ppm, format='PPM')
+
+            self._prefetch_neighbors(x, y, level, read_width, read_height)
+
+            self._set_status(x, y, level, k)
 
         except Exception as e:
-            print(f"Error reading region: {e}")
-            self.status_var.set(f"Error: {e}")
+            self._show_error(e)
+
+    def _set_status(self, x, y, level, k):
+        """Update the status label, at most once per STATUS_INTERVAL.
+
+        While a key is held, frames arrive faster than anyone can read the
+        label, so intermediate positions are dropped and a trailing update
+        shows the final one.
+        """
+        self._status_args = (x, y, level, k)
+        if self._pending_status is not None:
+            return  # the scheduled update will pick up these values
+        wait = self._last_status + STATUS_INTERVAL - time.monotonic()
+        if wait > 0:
+            self._pending_status = self.root.after(
+                int(wait * 1000) + 1, self._flush_status)
+        else:
+            self._flush_status()
+
+    def _flush_status(self):
+        """Format and push the most recent status to Tk."""
+        self._pending_status = None
+        self._last_status = time.monotonic()
+        x, y, level, k = self._status_args
+        scale_info = " | Display scale: %dx" % k if k > 1 else ""
+        self.status_var.set(STATUS_TEMPLATE % (
+            x, y, level, self.max_zoom,
+            self.level_downsamples[level] / k, scale_info))
+
+    def _show_error(self, e):
+        """Report a failed redraw and allow the same frame to be retried."""
+        self._last_render_key = None
+        if self._pending_status is not None:
+            self.root.after_cancel(self._pending_status)
+            self._pending_status = None
+        print(f"Error reading region: {e}")
+        self.status_var.set(f"Error: {e}")
 
     def run(self):
         """Start the main event loop."""
         self.root.mainloop()
+        self._io_pool.shutdown(wait=True, cancel_futures=True)
+        self._prefetch_pool.shutdown(wait=True, cancel_futures=True)
         self.slide.close()
 
 